@@ -1,43 +1,145 @@
+import os
+# Idle OpenMP threads sleep instead of spinning; has to be set before numpy/faiss load
+os.environ.setdefault("OMP_WAIT_POLICY", "PASSIVE")
 import re
+import time
+import asyncio
 from fastapi import FastAPI, HTTPException, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import Response, JSONResponse, StreamingResponse
 from pydantic import BaseModel
-import os
-import json
-import requests
+import base64
+import gc
+import sys
+import orjson
+import httpx
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 from cryptography.fernet import Fernet
 import pickle
 import numpy as np
 import logging
+import threading
 import traceback
+import hashlib
+import heapq
+from collections import OrderedDict
+from itertools import compress
 from uuid import uuid4
 from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 try:
     import faiss
+    logger.info(f"FAISS compile options: {faiss.get_compile_options()}")
+    # Single-query searches don't amortize waking a thread team
+    faiss.omp_set_num_threads(int(os.getenv("FAISS_THREADS", "1")))
 except ImportError:
     faiss = None
 
 SentenceTransformer = None
 
 try:
-    from bs4 import BeautifulSoup
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
 except ImportError:
-    BeautifulSoup = None
+    HTTP2_AVAILABLE = False
 
 try:
-    import html2text
+    from selectolax.lexbor import LexborHTMLParser
 except ImportError:
-    html2text = None
+    LexborHTMLParser = None
+
+BeautifulSoup = None
+html2text = None
+# The BeautifulSoup + html2text fallback is only imported when selectolax is missing
+if LexborHTMLParser is None:
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError:
+        pass
+
+    try:
+        import html2text
+    except ImportError:
+        pass
+
+PERSIST_INTERVAL_SECONDS = 5
+# Opt-in: loading torch + the local model costs ~1.3 GB per worker even for hosted-only setups
+PRELOAD_EMBEDDER = os.getenv("PRELOAD_EMBEDDER", "false").lower() == "true"
+# Queued URL ingests: a full queue makes new submissions wait instead of piling up
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_SIZE = 16
+INGEST_JOBS_KEPT = 1000
+http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100,
+                                max_keepalive_connections=20),
+            timeout=httpx.Timeout(30),
+            http2=HTTP2_AVAILABLE,
+        )
+    return http_client
+
+
+async def persist_vector_db(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=PERSIST_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        if vector_db.dirty:
+            await run_in_threadpool(vector_db.save_database)
+
+
+async def preload_embedding_model() -> None:
+    # Pays the torch import and weight load at boot rather than on the first ingest
+    try:
+        await run_in_threadpool(get_embedding_model)
+    except Exception as e:
+        logger.warning(f"Embedding model preload failed: {getattr(e, 'detail', e)}")
+
+
+class OrjsonResponse(JSONResponse):
+    # FastAPI's own ORJSONResponse is deprecated; same encoding without the warning
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_http_client()
+    stop = asyncio.Event()
+    persist_task = asyncio.create_task(persist_vector_db(stop))
+    if PRELOAD_EMBEDDER:
+        app.state.preload_task = asyncio.create_task(
+            preload_embedding_model())
+    workers = [asyncio.create_task(ingest_worker())
+               for _ in range(INGEST_WORKERS)]
+    yield
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    stop.set()
+    await persist_task
+    if http_client is not None:
+        await http_client.aclose()
+    for client in openai_clients.values():
+        await client.close()
+
 
 app = FastAPI(
     title="cogent-x",
+    lifespan=lifespan,
+    default_response_class=OrjsonResponse,
     version="2.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
@@ -78,12 +180,12 @@ VECTOR_DB_DIR.mkdir(exist_ok=True)
 
 
 def get_encryption_key() -> bytes:
-    if KEY_FILE.exists():
-        with open(KEY_FILE, "rb") as f:
-            return f.read()
+    try:
+        return KEY_FILE.read_bytes()
+    except FileNotFoundError:
+        pass
     key = Fernet.generate_key()
-    with open(KEY_FILE, "wb") as f:
-        f.write(key)
+    KEY_FILE.write_bytes(key)
     return key
 
 
@@ -117,24 +219,20 @@ DEFAULT_CONFIG = {
     "chunk_size": int(os.getenv("CHUNK_SIZE", "1000")),
     "chunk_overlap": int(os.getenv("CHUNK_OVERLAP", "200")),
     "top_k_results": int(os.getenv("TOP_K_RESULTS", "5")),
+    "ef_search": int(os.getenv("EF_SEARCH", "16")),
 }
 
 
 def load_config() -> Dict[str, Any]:
-    if CONFIG_FILE.exists():
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                config = json.load(f)
-                if config.get("openai_api_key"):
-                    config["openai_api_key"] = decrypt_value(
-                        config["openai_api_key"])
-                if config.get("gemini_api_key"):
-                    config["gemini_api_key"] = decrypt_value(
-                        config["gemini_api_key"])
-                return config
-        except:
-            return DEFAULT_CONFIG.copy()
-    return DEFAULT_CONFIG.copy()
+    try:
+        config = orjson.loads(CONFIG_FILE.read_bytes())
+        if config.get("openai_api_key"):
+            config["openai_api_key"] = decrypt_value(config["openai_api_key"])
+        if config.get("gemini_api_key"):
+            config["gemini_api_key"] = decrypt_value(config["gemini_api_key"])
+        return config
+    except:
+        return DEFAULT_CONFIG.copy()
 
 
 def save_config(config: dict) -> None:
@@ -145,89 +243,399 @@ def save_config(config: dict) -> None:
     if config_to_save.get("gemini_api_key"):
         config_to_save["gemini_api_key"] = encrypt_value(
             config_to_save["gemini_api_key"])
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config_to_save, f, indent=2)
+    with open(CONFIG_FILE, "wb") as f:
+        f.write(orjson.dumps(config_to_save, option=orjson.OPT_INDENT_2))
+
+
+def mask_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    masked = config.copy()
+    for field in ("openai_api_key", "gemini_api_key"):
+        key = masked.get(field)
+        if key and len(key) > 8:
+            masked[field] = key[:4] + "•" * (len(key) - 8) + key[-4:]
+    return masked
 
 
 CURRENT_CONFIG = load_config()
+# Built once per config change so GET /config never re-masks or decrypts
+MASKED_CONFIG = mask_config(CURRENT_CONFIG)
+
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 40
+# Flat search beats HNSW on small indexes; promote once we cross this size
+HNSW_MIN_VECTORS = 2000
+# Past this many vectors the graph stores scalar-quantized int8 codes instead of floats
+HNSW_SQ_MIN_VECTORS = 10_000
+# HNSW deletes are tombstoned until this fraction of the graph is dead, then rebuilt
+HNSW_MAX_TOMBSTONE_RATIO = 0.5
+
+# Saved vectors are served from the page cache instead of being read onto the heap
+INDEX_MMAP_FLAGS = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if faiss and hasattr(
+    faiss, "IO_FLAG_MMAP_IFC") else 0
+
+# Chunk metadata is stored column-wise: metadata key -> VectorDatabase attribute
+METADATA_COLUMNS = {
+    "source": "sources",
+    "title": "titles",
+    "chunk_index": "chunk_indices",
+    "total_chunks": "total_chunks",
+    "session_id": "session_ids",
+    "conversation_id": "conversation_ids",
+}
+# Repeated per chunk of a document; share one string object per value after load
+INTERNED_COLUMNS = {"sources", "titles", "session_ids", "conversation_ids"}
 
 
 class VectorDatabase:
-    def __init__(self, dimension: int = 1024):
+    def __init__(self, dimension: int = 1024, persist: bool = True):
         self.dimension = dimension
         self.index = None
+        # Set while self.index still reads its vectors from the mmapped file
+        self.mapped_index = None
         self.documents: List[str] = []
-        self.metadatas: List[Dict[str, Any]] = []
-        self.index_path = VECTOR_DB_DIR / "faiss_index.bin"
-        self.metadata_path = VECTOR_DB_DIR / "metadata.pkl"
-        self.load_database()
+        self._reset_metadata()
+        # Index id -> metadata row (-1 for tombstoned vectors); None while they line up
+        self.row_map: Optional[np.ndarray] = None
+        self.dirty = False
+        # Serializes writers; searches never wait on it
+        self.write_lock = asyncio.Lock()
+        if persist:
+            self.index_path = VECTOR_DB_DIR / "faiss_index.bin"
+            self.metadata_path = VECTOR_DB_DIR / "metadata.json"
+            self.legacy_metadata_path = VECTOR_DB_DIR / "metadata.pkl"
+            self.load_database()
+        else:
+            self.index_path = None
+            self.metadata_path = None
+            self.legacy_metadata_path = None
+            self._init_new_index()
 
     def load_database(self) -> None:
-        if self.index_path.exists() and self.metadata_path.exists():
+        has_metadata = self.metadata_path.exists() or self.legacy_metadata_path.exists()
+        if self.index_path.exists() and has_metadata:
+            needs_save = False
             try:
                 if faiss:
-                    self.index = faiss.read_index(str(self.index_path))
-                with open(self.metadata_path, "rb") as f:
-                    data = pickle.load(f)
-                    self.documents = data.get("documents", [])
-                    self.metadatas = data.get("metadatas", [])
+                    if hasattr(os, "posix_fadvise"):
+                        # Start readahead so the first searches don't fault pages in one by one
+                        fd = os.open(self.index_path, os.O_RDONLY)
+                        try:
+                            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                        finally:
+                            os.close(fd)
+                    self.index = faiss.read_index(
+                        str(self.index_path), INDEX_MMAP_FLAGS)
+                    if INDEX_MMAP_FLAGS:
+                        self.mapped_index = self.index
+                    self.dimension = self.index.d  # type: ignore
+                    # Indexes written before the switch to cosine similarity
+                    if self.index.metric_type != faiss.METRIC_INNER_PRODUCT:  # type: ignore
+                        embeddings_array = self.reconstruct_all()
+                        faiss.normalize_L2(embeddings_array)
+                        self.rebuild(embeddings_array)
+                        needs_save = True
+                try:
+                    data = orjson.loads(self.metadata_path.read_bytes())
+                except FileNotFoundError:
+                    # Databases saved before metadata moved to JSON
+                    # Unpickling the per-chunk dicts triggers a GC pass every few
+                    # hundred allocations, none of which can be cyclic garbage
+                    gc.disable()
+                    try:
+                        with open(self.legacy_metadata_path, "rb", buffering=1 << 20) as f:
+                            data = pickle.load(f)
+                    finally:
+                        gc.enable()
+                    needs_save = True
+                self.documents = data.get("documents", [])
+                self._reset_metadata()
+                if "columns" in data:
+                    for attr, values in data["columns"].items():
+                        if attr in INTERNED_COLUMNS:
+                            values = [sys.intern(v) if isinstance(
+                                v, str) else v for v in values]
+                        setattr(self, attr, values)
+                    self._index_sources()
+                else:
+                    self._extend_metadata(data.get("metadatas", []))
+                if data.get("row_map") is not None:
+                    self.row_map = np.array(data["row_map"], dtype=np.int64)
+                if needs_save:
+                    self.save_database()
             except:
                 self._init_new_index()
         else:
             self._init_new_index()
 
+    def _new_index(self, size: int, dimension: Optional[int] = None):
+        dimension = dimension or self.dimension
+        if size < HNSW_MIN_VECTORS:
+            return faiss.IndexFlatIP(dimension)  # type: ignore
+        if size < HNSW_SQ_MIN_VECTORS:
+            index = faiss.IndexHNSWFlat(  # type: ignore
+                dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)  # type: ignore
+        else:
+            # int8 codes: a quarter of the memory and bandwidth of float32 vectors
+            index = faiss.IndexHNSWSQ(  # type: ignore
+                dimension, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT)  # type: ignore
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+
     def _init_new_index(self) -> None:
         if not faiss:
             return
-        self.index = faiss.IndexFlatL2(self.dimension)  # type: ignore
+        self.index = self._new_index(0)
+        self.row_map = None
         self.documents = []
-        self.metadatas = []
+        self._reset_metadata()
+
+    def _reset_metadata(self) -> None:
+        self.sources: List[Optional[str]] = []
+        self.titles: List[Optional[str]] = []
+        self.chunk_indices: List[Optional[int]] = []
+        self.total_chunks: List[Optional[int]] = []
+        self.session_ids: List[Optional[str]] = []
+        self.conversation_ids: List[Optional[str]] = []
+        self._conversation_array: Optional[np.ndarray] = None
+        # source -> its rows, so per-source lookups skip the full column scan
+        self.source_rows: Dict[str, List[int]] = {}
+        # title -> chunk count, backing the knowledge-base list
+        self.title_counts: Dict[str, int] = {}
+
+    def _index_sources(self, start: int = 0) -> None:
+        for row in range(start, len(self.sources)):
+            source = self.sources[row]
+            if source:
+                self.source_rows.setdefault(source, []).append(row)
+            title = self.titles[row]
+            if title:
+                self.title_counts[title] = self.title_counts.get(title, 0) + 1
+
+    def _extend_metadata(self, metadatas: List[Dict[str, Any]]) -> None:
+        start = len(self.sources)
+        for key, attr in METADATA_COLUMNS.items():
+            getattr(self, attr).extend(
+                (metadata or {}).get(key) for metadata in metadatas)
+        self._conversation_array = None
+        self._index_sources(start)
+
+    def _extend_document_metadata(self, shared: Dict[str, Any], count: int) -> None:
+        # All chunks of one document: repeat the shared values, number the chunks
+        start = len(self.sources)
+        for key, attr in METADATA_COLUMNS.items():
+            if key == "chunk_index":
+                values: Any = range(count)
+            elif key == "total_chunks":
+                values = [count] * count
+            else:
+                value = shared.get(key)
+                values = [sys.intern(value) if isinstance(
+                    value, str) else value] * count
+            getattr(self, attr).extend(values)
+        self._conversation_array = None
+        self._index_sources(start)
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        values = ((key, getattr(self, attr)[i])
+                  for key, attr in METADATA_COLUMNS.items())
+        return {key: value for key, value in values if value is not None}
+
+    def keep_rows(self, keep: np.ndarray) -> None:
+        self.documents = list(compress(self.documents, keep))
+        for attr in METADATA_COLUMNS.values():
+            setattr(self, attr, list(compress(getattr(self, attr), keep)))
+        self._conversation_array = None
+        new_rows = np.cumsum(keep) - 1
+        source_rows = {}
+        for source, rows in self.source_rows.items():
+            rows = np.asarray(rows)
+            rows = new_rows[rows[keep[rows]]]
+            if len(rows):
+                source_rows[source] = rows.tolist()
+        self.source_rows = source_rows
+        title_counts: Dict[str, int] = {}
+        for title in self.titles:
+            if title:
+                title_counts[title] = title_counts.get(title, 0) + 1
+        self.title_counts = title_counts
+
+    def _selector(self, conversation_id: Optional[str], source: Optional[str] = None):
+        mask = None
+        if conversation_id:
+            if self._conversation_array is None:
+                self._conversation_array = np.array(
+                    self.conversation_ids, dtype=object)
+            # Documents ingested as "global" are visible to every conversation
+            mask = (self._conversation_array == conversation_id) | (
+                self._conversation_array == "global")
+        if source:
+            source_mask = np.zeros(len(self.documents), dtype=bool)
+            source_mask[self.source_rows.get(source, [])] = True
+            mask = source_mask if mask is None else mask & source_mask
+        if self.row_map is not None:
+            # Move the row mask onto index ids and hide tombstoned vectors
+            live = self.row_map >= 0
+            mask = live if mask is None else live & mask[np.maximum(
+                self.row_map, 0)]
+        if mask is None:
+            return None, None, self.count()
+        bitmap = np.packbits(mask, bitorder="little")
+        return faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap)), bitmap, int(mask.sum())
+
+    def can_tombstone(self, delete_mask: np.ndarray) -> bool:
+        if not isinstance(self.index, faiss.IndexHNSW):
+            return False
+        dead = self.index.ntotal - len(self.documents) + \
+            int(delete_mask.sum())  # type: ignore
+        return dead <= HNSW_MAX_TOMBSTONE_RATIO * self.index.ntotal  # type: ignore
+
+    def tombstone_rows(self, delete_mask: np.ndarray) -> None:
+        # HNSW graphs can't drop nodes; leave the vectors in place and unmap them
+        row_map = self.row_map if self.row_map is not None else np.arange(
+            self.index.ntotal, dtype=np.int64)  # type: ignore
+        new_rows = np.cumsum(~delete_mask) - 1
+        new_rows[delete_mask] = -1
+        live = row_map >= 0
+        self.row_map = np.where(live, new_rows[np.where(live, row_map, 0)], -1)
+        self.keep_rows(~delete_mask)
+        self.dirty = True
+
+    def index_without(self, delete_mask: np.ndarray):
+        # Built off to the side so the live index keeps serving searches meanwhile
+        if isinstance(self.index, faiss.IndexFlat):
+            # Flat indexes compact on removal, shifting later ids down like keep_rows does
+            index = self._writable_copy()
+            index.remove_ids(np.flatnonzero(delete_mask).astype(np.int64))
+            return index
+        # Too many tombstones; rebuild from the surviving vectors
+        return self._build_index(self.embeddings_by_row()[~delete_mask])
+
+    def _writable_copy(self):
+        if self.index is self.mapped_index:
+            # clone_index keeps viewing the mapping; a serialize round trip owns its codes
+            return faiss.deserialize_index(faiss.serialize_index(self.index))
+        return faiss.clone_index(self.index)
+
+    def remove_rows(self, delete_mask: np.ndarray, index=None) -> None:
+        # Rows and index are swapped together with no await in between
+        self.index = index if index is not None else self.index_without(
+            delete_mask)
+        self.row_map = None
+        self.keep_rows(~delete_mask)
+        self.dirty = True
+
+    def _build_index(self, embeddings_array: np.ndarray):
+        index = self._new_index(
+            len(embeddings_array), embeddings_array.shape[1])
+        if not index.is_trained:
+            index.train(embeddings_array)  # type: ignore
+        index.add(embeddings_array)  # type: ignore
+        return index
+
+    def rebuild(self, embeddings_array: np.ndarray) -> None:
+        self.dimension = embeddings_array.shape[1]
+        self.index = self._build_index(embeddings_array)
+        self.row_map = None
+
+    def reconstruct_all(self) -> np.ndarray:
+        if not self.index or self.index.ntotal == 0:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return self.index.reconstruct_n(0, self.index.ntotal)  # type: ignore
+
+    def embeddings_by_row(self) -> np.ndarray:
+        embeddings = self.reconstruct_all()
+        # Live ids keep their relative order, so dropping tombstones yields row order
+        return embeddings if self.row_map is None else embeddings[self.row_map >= 0]
 
     def save_database(self) -> None:
-        if not self.index or not faiss:
+        if not self.index or not faiss or not self.index_path:
             return
+        self.dirty = False
         try:
-            faiss.write_index(self.index, str(self.index_path))
-            with open(self.metadata_path, "wb") as f:
-                pickle.dump({"documents": self.documents,
-                            "metadatas": self.metadatas}, f)
+            index_tmp = self.index_path.with_suffix(".tmp")
+            faiss.write_index(self.index, str(index_tmp))
+            metadata_tmp = self.metadata_path.with_suffix(".tmp")
+            columns = {attr: getattr(self, attr)
+                       for attr in METADATA_COLUMNS.values()}
+            row_map = self.row_map.tolist() if self.row_map is not None else None
+            with open(metadata_tmp, "wb") as f:
+                f.write(orjson.dumps(
+                    {"documents": self.documents, "columns": columns, "row_map": row_map}))
+            os.replace(index_tmp, self.index_path)
+            os.replace(metadata_tmp, self.metadata_path)
         except:
-            pass
+            self.dirty = True
 
-    def add(self, embeddings: List[List[float]], documents: List[str], metadatas: List[Dict[str, Any]]) -> None:
-        if not self.index:
-            self._init_new_index()
-        if not self.index:
+    def index_with(self, embeddings: Union[np.ndarray, List[List[float]]], normalize: bool = True):
+        # Built off to the side like index_without, so searches keep using the live index.
+        # Callers hold write_lock so rows can't change meanwhile
+        if not faiss:
             raise RuntimeError("FAISS not installed")
-
-        embeddings_array = np.array(embeddings, dtype=np.float32)
-        # type: ignore
-        if self.index.ntotal == 0 and embeddings_array.shape[1] != self.dimension:
-            self.dimension = embeddings_array.shape[1]
-            self._init_new_index()
-
-        self.index.add(embeddings_array)  # type: ignore
+        embeddings_array = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if normalize:
+            faiss.normalize_L2(embeddings_array)
+        size, new_size = self.count(), self.count() + len(embeddings_array)
+        if not self.index or self.index.ntotal == 0:
+            return self._build_index(embeddings_array), True
+        if any(size < tier <= new_size for tier in (HNSW_MIN_VECTORS, HNSW_SQ_MIN_VECTORS)):
+            return self._build_index(np.concatenate(
+                [self.embeddings_by_row(), embeddings_array])), True
+        # Also keeps writes out of a mapped index, which FAISS aborts on
+        index = self._writable_copy()
+        index.add(embeddings_array)  # type: ignore
+        return index, False
+
+    def add(self, embeddings: Union[np.ndarray, List[List[float]]], documents: List[str], metadatas: Optional[List[Dict[str, Any]]] = None, normalize: bool = True, document_metadata: Optional[Dict[str, Any]] = None, prepared: Optional[tuple] = None) -> None:
+        # prepared is index_with's result when the caller built it in the threadpool
+        index, rebuilt = prepared or self.index_with(embeddings, normalize)
+        # Index and rows are swapped together with no await in between
+        if rebuilt:
+            self.row_map = None
+        elif self.row_map is not None:
+            self.row_map = np.concatenate([self.row_map, np.arange(
+                len(self.documents), len(self.documents) + len(documents))])
+        self.index = index
+        self.dimension = index.d  # type: ignore
         self.documents.extend(documents)
-        self.metadatas.extend(metadatas)
-        self.save_database()
+        if document_metadata is not None:
+            self._extend_document_metadata(document_metadata, len(documents))
+        else:
+            self._extend_metadata(metadatas or [])
+        self.dirty = True
 
-    def search(self, query_embedding: List[float], k: int = 5) -> Dict[str, Any]:
-        if not self.index or self.index.ntotal == 0:
-            return {"documents": [], "metadatas": [], "distances": []}
+    def search(self, query_embedding: List[float], k: int = 5, ef_search: int = DEFAULT_CONFIG["ef_search"], conversation_id: Optional[str] = None, normalize: bool = True, source: Optional[str] = None) -> Dict[str, Any]:
+        empty = {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+        if self.count() == 0:
+            return empty
 
         query_array = np.array([query_embedding], dtype=np.float32)
-        k = min(k, self.index.ntotal)  # type: ignore
-        distances, indices = self.index.search(query_array, k)  # type: ignore
+        if normalize:
+            faiss.normalize_L2(query_array)
+        # Restrict the search inside FAISS so filtering doesn't cost recall
+        selector, bitmap, allowed = self._selector(conversation_id, source)
+        if allowed == 0:
+            return empty
+        k = min(k, allowed)
+        if isinstance(self.index, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW(
+                efSearch=max(ef_search, k * 2), sel=selector)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        distances, indices = self.index.search(  # type: ignore
+            query_array, k, params=params)
 
-        results_docs = [self.documents[i]
-                        for i in indices[0] if i < len(self.documents)]
-        results_meta = [self.metadatas[i]
-                        for i in indices[0] if i < len(self.metadatas)]
+        # FAISS pads with -1 when fewer than k vectors pass the selector
+        valid = indices[0] >= 0
+        ids = indices[0][valid]
+        rows = (ids if self.row_map is None else self.row_map[ids]).tolist()
+        results_docs = [self.documents[i] for i in rows]
+        results_meta = [self.metadata(i) for i in rows]
 
-        return {"documents": [results_docs], "metadatas": [results_meta], "distances": distances.tolist()}
+        return {"documents": [results_docs], "metadatas": [results_meta], "distances": distances[:, valid]}
 
     def count(self) -> int:
-        return self.index.ntotal if self.index else 0  # type: ignore
+        return len(self.documents) if self.index else 0
 
     def clear(self) -> None:
         self._init_new_index()
@@ -241,26 +649,23 @@ class SessionManager:
     def __init__(self, session_timeout_hours: int = 24):
         self.sessions: Dict[str, Dict[str, Any]] = {}
         self.session_timeout = timedelta(hours=session_timeout_hours)
+        # (earliest possible expiry, session_id); entries are re-checked lazily on pop
+        self._expiry_heap: List[tuple[datetime, str]] = []
 
     def get_or_create_session(self, session_id: Optional[str] = None) -> tuple[str, 'VectorDatabase']:
         self._cleanup_expired()
         if not session_id or session_id not in self.sessions:
             session_id = str(uuid4())
-            # Load latest config from disk for new sessions
-            latest_config = load_config()
+            # CURRENT_CONFIG already mirrors the decrypted disk config
             self.sessions[session_id] = {
-                'db': VectorDatabase.__new__(VectorDatabase),
+                'db': VectorDatabase(persist=False),
                 'created_at': datetime.now(),
                 'last_accessed': datetime.now(),
-                'config': latest_config.copy()
+                'config': CURRENT_CONFIG.copy(),
+                'masked_config': MASKED_CONFIG
             }
-            db = self.sessions[session_id]['db']
-            db.dimension = 1024
-            db.documents = []
-            db.metadatas = []
-            db.index_path = None
-            db.metadata_path = None
-            db._init_new_index()
+            heapq.heappush(self._expiry_heap,
+                           (datetime.now() + self.session_timeout, session_id))
         self.sessions[session_id]['last_accessed'] = datetime.now()
         return session_id, self.sessions[session_id]['db']
 
@@ -292,18 +697,36 @@ class SessionManager:
             session = self.sessions[session_id]
             if not self._is_expired(session):
                 session['config'] = config
+                session['masked_config'] = mask_config(
+                    {**CURRENT_CONFIG, **config})
                 session['last_accessed'] = datetime.now()
                 return True
         return False
 
+    def get_masked_config(self, session_id: str) -> Optional[Dict[str, Any]]:
+        if session_id in self.sessions:
+            session = self.sessions[session_id]
+            if not self._is_expired(session):
+                session['last_accessed'] = datetime.now()
+                return session.get('masked_config')
+        return None
+
     def _is_expired(self, session: Dict[str, Any]) -> bool:
         return datetime.now() - session['last_accessed'] > self.session_timeout
 
     def _cleanup_expired(self):
-        expired = [sid for sid, sess in self.sessions.items()
-                   if self._is_expired(sess)]
-        for sid in expired:
-            del self.sessions[sid]
+        now = datetime.now()
+        while self._expiry_heap and self._expiry_heap[0][0] < now:
+            _, sid = heapq.heappop(self._expiry_heap)
+            session = self.sessions.get(sid)
+            if session is None:
+                continue  # Already deleted
+            if self._is_expired(session):
+                del self.sessions[sid]
+            else:
+                # Accessed since this entry was pushed; reschedule
+                heapq.heappush(self._expiry_heap,
+                               (session['last_accessed'] + self.session_timeout, sid))
 
     def get_session_stats(self, session_id: str) -> Optional[Dict[str, Any]]:
         if session_id in self.sessions:
@@ -321,11 +744,16 @@ class SessionManager:
 session_manager = SessionManager(session_timeout_hours=24)
 vector_db = VectorDatabase()
 embedding_model = None
+embedding_model_lock = threading.Lock()
 
 
 def get_embedding_model():
     global embedding_model, SentenceTransformer
-    if not embedding_model:
+    if embedding_model:
+        return embedding_model
+    with embedding_model_lock:
+        if embedding_model:
+            return embedding_model
         if not SentenceTransformer:
             try:
                 from sentence_transformers import SentenceTransformer as ST
@@ -336,16 +764,172 @@ def get_embedding_model():
         try:
             model_name = CURRENT_CONFIG.get(
                 "embedding_model_name", "BAAI/bge-large-en-v1.5")
-            embedding_model = SentenceTransformer(model_name)
+            embedding_model = _load_embedding_model(model_name)
         except Exception:
-            embedding_model = SentenceTransformer(
+            embedding_model = _load_embedding_model(
                 "sentence-transformers/all-MiniLM-L6-v2")
     return embedding_model
 
 
-def get_embeddings(texts: List[str], provider: str = "opensource", task_type: str = "retrieval_document", config: Optional[Dict[str, Any]] = None) -> List[List[float]]:
+EMBEDDING_ONNX_DIR = VECTOR_DB_DIR / "embed_onnx"
+ONNX_QUANTIZED_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+
+def _load_onnx_model(model_name: str):
+    export_dir = EMBEDDING_ONNX_DIR / model_name.replace("/", "__")
+    if not (export_dir / ONNX_QUANTIZED_FILE).exists():
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        model = SentenceTransformer(model_name, backend="onnx")  # type: ignore
+        model.save(str(export_dir))
+        export_dynamic_quantized_onnx_model(
+            model, "avx512_vnni", str(export_dir))
+    return SentenceTransformer(  # type: ignore
+        str(export_dir), backend="onnx", model_kwargs={"file_name": ONNX_QUANTIZED_FILE})
+
+
+def _load_embedding_model(model_name: str):
+    import torch
+    if torch.cuda.is_available():
+        return SentenceTransformer(model_name, device="cuda").half()  # type: ignore
+    # int8 ONNX Runtime on CPU; needs optimum[onnxruntime], so fall back to PyTorch
+    try:
+        return _load_onnx_model(model_name)
+    except Exception as e:
+        logger.info(f"ONNX embedding backend unavailable, using PyTorch: {e}")
+        return SentenceTransformer(model_name)  # type: ignore
+
+
+# Larger batches keep the fp16 GPU kernels and the int8 CPU GEMMs busy
+ENCODE_BATCH_SIZE = {"cuda": 128, "cpu": 64}
+
+
+def _encode_local(model, texts: List[str]) -> np.ndarray:
+    import torch
+    batch_size = ENCODE_BATCH_SIZE.get(model.device.type, 64)
+    with torch.inference_mode():
+        return model.encode(texts, convert_to_numpy=True, normalize_embeddings=True,
+                            batch_size=batch_size, show_progress_bar=False)
+
+
+openai_clients: Dict[str, Any] = {}
+
+
+def get_openai_client(api_key: str):
+    import openai
+    client = openai_clients.get(api_key)
+    if client is None:
+        client = openai.AsyncOpenAI(api_key=api_key)
+        openai_clients[api_key] = client
+    return client
+
+
+gemini_models: Dict[tuple, Any] = {}
+gemini_lock = threading.Lock()
+gemini_configured_key: Optional[str] = None
+
+
+def configure_gemini(genai, api_key: str) -> None:
+    # genai.configure swaps process-wide client state; only redo it when the key changes
+    global gemini_configured_key
+    with gemini_lock:
+        if api_key != gemini_configured_key:
+            genai.configure(api_key=api_key)
+            gemini_configured_key = api_key
+
+
+def get_gemini_model(genai, api_key: str, model_name: str):
+    configure_gemini(genai, api_key)
+    key = (hashlib.blake2b(api_key.encode(), digest_size=16).digest(), model_name)
+    with gemini_lock:
+        model = gemini_models.get(key)
+        if model is None:
+            model = gemini_models[key] = genai.GenerativeModel(model_name)
+    return model
+
+
+EMBEDDING_CONCURRENCY = 8
+
+
+async def _embed_in_batches(texts: List[str], batch_size: int, embed_batch) -> List[List[float]]:
+    semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+
+    async def run(batch: List[str]) -> List[List[float]]:
+        async with semaphore:
+            return await embed_batch(batch)
+
+    # Similar-length texts share a batch so the provider pads less; order is restored below
+    order = np.argsort([len(text) for text in texts], kind="stable")
+    ordered = [texts[i] for i in order]
+    batches = [ordered[i:i + batch_size]
+               for i in range(0, len(ordered), batch_size)]
+    results = await asyncio.gather(*[run(batch) for batch in batches])
+    embeddings: List[Any] = [None] * len(texts)
+    for i, embedding in zip(order, (e for result in results for e in result)):
+        embeddings[i] = embedding
+    return embeddings
+
+
+# OpenAI and the local model return unit-length vectors; the rest get normalized by FAISS
+NORMALIZE_PROVIDERS = {"gemini"}
+EMBEDDING_CACHE_SIZE = 50_000
+embedding_cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+# Keys currently being embedded, so concurrent identical queries share one call
+embedding_inflight: Dict[tuple, asyncio.Future] = {}
+
+
+async def get_embeddings(texts: List[str], provider: str = "opensource", task_type: str = "retrieval_document", config: Optional[Dict[str, Any]] = None) -> np.ndarray:
     active_config = config if config else CURRENT_CONFIG
+    model = active_config.get(f"{provider}_embedding_model", "")
+    keys = [(provider, model, task_type, hashlib.blake2b(
+        text.encode(), digest_size=16).digest()) for text in texts]
+
+    # Shared boilerplate chunks (nav, footers, re-ingested pages) only get embedded once
+    found: Dict[tuple, np.ndarray] = {}
+    missing: Dict[tuple, str] = {}
+    pending: Dict[tuple, asyncio.Future] = {}
+    for key, text in zip(keys, texts):
+        if key in embedding_cache:
+            embedding_cache.move_to_end(key)
+            found[key] = embedding_cache[key]
+        elif key in embedding_inflight:
+            pending[key] = embedding_inflight[key]
+        else:
+            missing.setdefault(key, text)
 
+    if missing:
+        future = asyncio.get_running_loop().create_future()
+        for key in missing:
+            embedding_inflight[key] = future
+        try:
+            vectors = await _compute_embeddings(
+                list(missing.values()), provider, task_type, active_config)
+            computed = {key: np.asarray(vector, dtype=np.float32)
+                        for key, vector in zip(missing, vectors)}
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't warn if there are none
+            raise
+        finally:
+            for key in missing:
+                embedding_inflight.pop(key, None)
+        future.set_result(computed)
+        found.update(computed)
+        embedding_cache.update(computed)
+        while len(embedding_cache) > EMBEDDING_CACHE_SIZE:
+            embedding_cache.popitem(last=False)
+
+    for key, waiting in pending.items():
+        found[key] = (await waiting)[key]
+
+    if not keys:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.stack([found[key] for key in keys])
+
+
+async def _compute_embeddings(texts: List[str], provider: str, task_type: str, active_config: Dict[str, Any]) -> List[List[float]]:
     if provider == "openai":
         try:
             import openai
@@ -357,17 +941,17 @@ def get_embeddings(texts: List[str], provider: str = "opensource", task_type: st
             raise HTTPException(
                 status_code=400, detail="OpenAI API key not configured")
 
-        client = openai.OpenAI(api_key=api_key)
+        client = get_openai_client(api_key)
         model = active_config.get(
             "openai_embedding_model", "text-embedding-3-small")
-        embeddings = []
-        batch_size = 100
 
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            response = client.embeddings.create(input=batch, model=model)
-            embeddings.extend([item.embedding for item in response.data])
-        return embeddings
+        async def embed_openai(batch: List[str]) -> List[np.ndarray]:
+            # Raw float32 bytes instead of JSON floats the SDK would turn into lists
+            response = await client.embeddings.create(input=batch, model=model, encoding_format="base64")
+            return [np.frombuffer(base64.b64decode(item.embedding), dtype=np.float32)
+                    for item in response.data]
+
+        return await _embed_in_batches(texts, 100, embed_openai)
 
     elif provider == "gemini":
         try:
@@ -381,33 +965,72 @@ def get_embeddings(texts: List[str], provider: str = "opensource", task_type: st
             raise HTTPException(
                 status_code=400, detail="Gemini API key not configured")
 
-        genai.configure(api_key=api_key)
+        configure_gemini(genai, api_key)
         embedding_model = active_config.get(
             "gemini_embedding_model", "models/text-embedding-004")
-        embeddings = []
-        batch_size = 50
 
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            for text in batch:
-                result = genai.embed_content(
-                    model=embedding_model, content=text, task_type=task_type)
-                embeddings.append(result['embedding'])
-        return embeddings
+        async def embed_gemini(batch: List[str]) -> List[List[float]]:
+            result = await run_in_threadpool(
+                genai.embed_content, model=embedding_model, content=batch, task_type=task_type)
+            return result['embedding']
+
+        return await _embed_in_batches(texts, 100, embed_gemini)
 
     else:
-        model = get_embedding_model()
-        embeddings_array = model.encode(
-            texts, convert_to_numpy=True, batch_size=32, show_progress_bar=False)
-        return embeddings_array.tolist()
+        model = await run_in_threadpool(get_embedding_model)
+        return await run_in_threadpool(_encode_local, model, texts)
 
 
-def scrape_url(url: str) -> Dict[str, str]:
-    if not BeautifulSoup:
-        raise HTTPException(
-            status_code=500, detail="beautifulsoup4 not installed")
-    if not html2text:
-        raise HTTPException(status_code=500, detail="html2text not installed")
+# Pages are read in chunks and cut off here so one huge page can't exhaust memory
+MAX_PAGE_BYTES = 10 * 1024 * 1024
+STRIPPED_TAGS = ["script", "style", "nav", "footer", "aside", "header"]
+INLINE_SPACE_RE = re.compile(r'[^\S\n]+')
+LINE_BREAK_RE = re.compile(r' ?\n\s*')
+BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+
+def extract_page(html: Union[str, bytes], url: str) -> tuple[str, str]:
+    if LexborHTMLParser:
+        tree = LexborHTMLParser(html)
+        for tag in tree.css(",".join(STRIPPED_TAGS)):
+            tag.decompose()
+
+        title = tree.css_first('title')
+        title_text = title.text().strip() if title else ""
+
+        root = tree.body or tree.root
+        content = root.text(separator=' ') if root else ""
+        content = INLINE_SPACE_RE.sub(' ', content)
+        content = LINE_BREAK_RE.sub('\n', content).strip()
+        return title_text or url, content
+
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(STRIPPED_TAGS):
+        script.decompose()
+
+    title = soup.find('title')
+    title_text = title.get_text().strip() if title else url
+
+    h = html2text.HTML2Text()
+    h.ignore_links = False
+    h.ignore_images = True
+    h.ignore_emphasis = False
+    h.body_width = 0
+    h.unicode_snob = True
+
+    content = h.handle(str(soup))
+    content = BLANK_LINES_RE.sub('\n\n', content).strip()
+    return title_text, content
+
+
+async def scrape_url(url: str) -> Dict[str, str]:
+    if not LexborHTMLParser:
+        if not BeautifulSoup:
+            raise HTTPException(
+                status_code=500, detail="selectolax or beautifulsoup4 not installed")
+        if not html2text:
+            raise HTTPException(
+                status_code=500, detail="html2text not installed")
 
     # Try multiple user agents in case one is blocked
     user_agents = [
@@ -425,36 +1048,35 @@ def scrape_url(url: str) -> Dict[str, str]:
                 'Accept-Language': 'en-US,en;q=0.5',
                 'Accept-Encoding': 'gzip, deflate, br',
                 'DNT': '1',
-                'Connection': 'keep-alive',
                 'Upgrade-Insecure-Requests': '1'
             }
-            response = requests.get(
-                url, headers=headers, timeout=30, allow_redirects=True)
-            response.raise_for_status()
-
-            soup = BeautifulSoup(response.content, 'html.parser')
-            for script in soup(["script", "style", "nav", "footer", "aside", "header"]):
-                script.decompose()
-
-            title = soup.find('title')
-            title_text = title.get_text().strip() if title else url
-
-            h = html2text.HTML2Text()
-            h.ignore_links = False
-            h.ignore_images = True
-            h.ignore_emphasis = False
-            h.body_width = 0
-            h.unicode_snob = True
-
-            content = h.handle(str(soup))
-            content = re.sub(r'\n{3,}', '\n\n', content).strip()
+            body = bytearray()
+            async with get_http_client().stream("GET", url, headers=headers, follow_redirects=True) as response:
+                response.raise_for_status()
+                charset = response.charset_encoding
+                async for data in response.aiter_bytes():
+                    body += data
+                    if len(body) >= MAX_PAGE_BYTES:
+                        del body[MAX_PAGE_BYTES:]
+                        logger.warning(
+                            f"Truncated {url} at {MAX_PAGE_BYTES} bytes")
+                        break
+
+            html: Union[str, bytes] = bytes(body)
+            if charset:
+                # The parsers would otherwise assume UTF-8 (or trust <meta>) for non-UTF-8 pages
+                try:
+                    html = body.decode(charset, errors="replace")
+                except LookupError:
+                    pass
+            title_text, content = extract_page(html, url)
 
             if not content or len(content.strip()) < 50:
                 raise ValueError("Page content is empty or too short")
 
             return {"title": title_text, "content": content, "url": url}
 
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPStatusError as e:
             last_error = e
             if e.response.status_code == 403:
                 continue  # Try next user agent
@@ -464,10 +1086,10 @@ def scrape_url(url: str) -> Dict[str, str]:
             else:
                 raise HTTPException(
                     status_code=400, detail=f"HTTP {e.response.status_code}: Unable to access {url}")
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             raise HTTPException(
                 status_code=400, detail=f"Request timeout: Website took too long to respond. Try a different URL.")
-        except requests.exceptions.ConnectionError:
+        except httpx.ConnectError:
             raise HTTPException(
                 status_code=400, detail=f"Connection failed: Unable to reach {url}. Check your internet connection.")
         except Exception as e:
@@ -476,7 +1098,7 @@ def scrape_url(url: str) -> Dict[str, str]:
 
     # If all user agents failed, raise appropriate exception
     if last_error:
-        if isinstance(last_error, requests.exceptions.HTTPError) and last_error.response.status_code == 403:
+        if isinstance(last_error, httpx.HTTPStatusError) and last_error.response.status_code == 403:
             raise HTTPException(
                 status_code=400,
                 detail=f"Access denied: {url} is blocking automated access. Try a different documentation source or use their official API."
@@ -489,23 +1111,36 @@ def scrape_url(url: str) -> Dict[str, str]:
         status_code=400, detail="Failed to scrape: Unknown error")
 
 
+SENTENCE_PUNCTUATION = np.array([ord(c) for c in ".!?"], dtype=np.uint32)
+WHITESPACE_CODEPOINTS = np.array(
+    [c for c in range(0x3001) if chr(c).isspace()], dtype=np.uint32)
+
+
 def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
     if len(text) <= chunk_size:
         return [text]
 
+    # Locate every sentence end (r'[.!?]\s+') once, indexed by character
+    codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    is_space = np.isin(codepoints, WHITESPACE_CODEPOINTS)
+    sentence_ends = np.flatnonzero(
+        np.isin(codepoints[:-1], SENTENCE_PUNCTUATION) & is_space[1:])
+    non_space = np.flatnonzero(~is_space)
+
     chunks = []
     start = 0
     text_len = len(text)
-    sentence_end = re.compile(r'[.!?]\s+')
 
     while start < text_len:
         end = min(start + chunk_size, text_len)
         if end < text_len:
             search_start = max(start, end - 200)
-            remaining = text[search_start:end]
-            matches = list(sentence_end.finditer(remaining))
-            if matches:
-                end = search_start + matches[-1].end()
+            last = int(np.searchsorted(sentence_ends, end - 1)) - 1
+            if last >= 0 and sentence_ends[last] >= search_start:
+                next_word = int(np.searchsorted(
+                    non_space, sentence_ends[last] + 1))
+                if next_word < len(non_space):
+                    end = min(end, int(non_space[next_word]))
 
         chunk = text[start:end].strip()
         if chunk and len(chunk) > 10:
@@ -518,8 +1153,54 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[st
     return chunks
 
 
-def query_llm(prompt: str, context: str, provider: str, config: Optional[Dict[str, Any]] = None) -> str:
+# Failover is opt-in: it can send the question and retrieved context to a hosted provider
+LLM_FAILOVER = os.getenv("LLM_FAILOVER", "false").lower() == "true"
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+LLM_PROVIDERS = ["openai", "gemini", "opensource"]
+# Timeouts, rate limits and server errors move on to the next provider; other 4xx are the caller's to fix
+FAILOVER_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def provider_configured(provider: str, config: Dict[str, Any]) -> bool:
+    if provider == "opensource":
+        return True
+    key = (config.get(f"{provider}_api_key") or "").strip()
+    return len(key) > 10 and "•" not in key
+
+
+async def query_llm(prompt: str, context: str, provider: str, config: Optional[Dict[str, Any]] = None) -> tuple[str, str]:
+    """Returns the answer and the provider that produced it."""
     active_config = config if config else CURRENT_CONFIG
+    if not LLM_FAILOVER:
+        return await _query_provider(prompt, context, provider, active_config), provider
+
+    chain = [provider] + [other for other in LLM_PROVIDERS
+                          if other != provider and provider_configured(other, active_config)]
+    failures = []
+    for candidate in chain:
+        try:
+            answer = await asyncio.wait_for(
+                _query_provider(prompt, context, candidate, active_config), LLM_TIMEOUT_SECONDS)
+            if candidate != provider:
+                logger.warning(
+                    f"LLM provider {provider} failed; answered by {candidate}")
+            return answer, candidate
+        except asyncio.TimeoutError:
+            error = HTTPException(
+                status_code=504, detail=f"{candidate} timed out after {LLM_TIMEOUT_SECONDS:g}s")
+        except HTTPException as he:
+            if he.status_code not in FAILOVER_STATUS:
+                raise
+            error = he
+        failures.append(error)
+        logger.warning(f"LLM provider {candidate} failed: {error.detail}")
+    if len(failures) == 1:
+        raise failures[0]
+    raise HTTPException(status_code=failures[-1].status_code,
+                        detail="All providers failed: " + "; ".join(str(e.detail) for e in failures))
+
+
+async def _query_provider(prompt: str, context: str, provider: str, active_config: Dict[str, Any]) -> str:
     full_prompt = f"""Based on the following context, answer the question accurately and concisely.
 
 Context:
@@ -534,11 +1215,14 @@ Answer:"""
             "ollama_base_url", "http://localhost:11434")
         model = active_config.get("ollama_model", "llama3:8b")
         try:
-            response = requests.post(f"{ollama_url}/api/generate", json={
-                                     "model": model, "prompt": full_prompt, "stream": False}, timeout=120)
+            response = await get_http_client().post(f"{ollama_url}/api/generate", json={
+                "model": model, "prompt": full_prompt, "stream": False}, timeout=120)
             response.raise_for_status()
             result = response.json().get("response", "")
             return result if result else "No response generated"
+        except httpx.HTTPStatusError as e:
+            raise HTTPException(
+                status_code=e.response.status_code, detail=f"Ollama error: {str(e)}")
         except Exception as e:
             raise HTTPException(
                 status_code=500, detail=f"Ollama error: {str(e)}")
@@ -554,10 +1238,10 @@ Answer:"""
             raise HTTPException(
                 status_code=400, detail="OpenAI API key not configured")
 
-        client = openai.OpenAI(api_key=api_key)
+        client = get_openai_client(api_key)
         model = active_config.get("openai_model", "gpt-4")
         try:
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=model,
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant that answers questions based on provided context."},
@@ -570,7 +1254,7 @@ Answer:"""
             return content if content else "No response generated"
         except Exception as e:
             raise HTTPException(
-                status_code=500, detail=f"OpenAI error: {str(e)}")
+                status_code=getattr(e, "status_code", None) or 500, detail=f"OpenAI error: {str(e)}")
 
     elif provider == "gemini":
         try:
@@ -584,12 +1268,11 @@ Answer:"""
             raise HTTPException(
                 status_code=400, detail="Gemini API key not configured")
 
-        genai.configure(api_key=api_key)
         model_name = active_config.get("gemini_model", "gemini-pro")
 
         try:
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(full_prompt)
+            model = get_gemini_model(genai, api_key, model_name)
+            response = await run_in_threadpool(model.generate_content, full_prompt)
 
             # Handle blocked or empty responses
             if not response or not hasattr(response, 'text') or not response.text:
@@ -620,20 +1303,26 @@ Answer:"""
         status_code=400, detail=f"Unknown provider: {provider}")
 
 
-def check_ollama_health(session_config: Optional[Dict] = None) -> bool:
+# Ollama probe results per base URL, reused for HEALTH_CACHE_TTL seconds
+HEALTH_CACHE_TTL = 5.0
+_ollama_health: Dict[str, tuple] = {}
+
+
+async def check_ollama_health(session_config: Optional[Dict] = None) -> bool:
     config = session_config if session_config else CURRENT_CONFIG
-    openai_key = config.get("openai_api_key", "").strip()
-    if openai_key and len(openai_key) > 10 and "•" not in openai_key:
-        return True
-    gemini_key = config.get("gemini_api_key", "").strip()
-    if gemini_key and len(gemini_key) > 10 and "•" not in gemini_key:
+    if provider_configured("openai", config) or provider_configured("gemini", config):
         return True
+    ollama_url = config.get("ollama_base_url", "http://localhost:11434")
+    cached = _ollama_health.get(ollama_url)
+    if cached and time.monotonic() - cached[0] < HEALTH_CACHE_TTL:
+        return cached[1]
     try:
-        ollama_url = config.get("ollama_base_url", "http://localhost:11434")
-        response = requests.get(f"{ollama_url}/api/tags", timeout=2)
-        return response.status_code == 200
+        response = await get_http_client().get(f"{ollama_url}/api/tags", timeout=2.0)
+        healthy = response.status_code == 200
     except:
-        return False
+        healthy = False
+    _ollama_health[ollama_url] = (time.monotonic(), healthy)
+    return healthy
 
 
 def check_vectordb_health() -> bool:
@@ -657,6 +1346,7 @@ class Configuration(BaseModel):
     chunk_size: int
     chunk_overlap: int
     top_k_results: int
+    ef_search: int = DEFAULT_CONFIG["ef_search"]
 
 
 class IngestRequest(BaseModel):
@@ -669,6 +1359,7 @@ class QueryRequest(BaseModel):
     query: str
     provider: str = "opensource"
     conversation_id: Optional[str] = None
+    source_url: Optional[str] = None
 
 
 # ============= API Endpoints =============
@@ -684,7 +1375,7 @@ async def health_check(x_session_id: Optional[str] = Header(None)):
 
     return {
         "backend": True,
-        "llm": check_ollama_health(session_config),
+        "llm": await check_ollama_health(session_config),
         "vectorDB": check_vectordb_health(),
         "config_loaded": CURRENT_CONFIG is not None,
         "session_active": x_session_id is not None
@@ -696,29 +1387,8 @@ async def get_configuration(response: Response, x_session_id: Optional[str] = He
     session_id, _ = session_manager.get_or_create_session(x_session_id)
     response.headers["X-Session-Id"] = session_id
 
-    # Load from global config first, then merge with session config
-    global CURRENT_CONFIG
-    CURRENT_CONFIG = load_config()  # Reload from disk to get latest
-    config = CURRENT_CONFIG.copy()
-
-    # Merge with session-specific config if exists
-    session_config = session_manager.get_session_config(session_id)
-    if session_config:
-        config.update(session_config)
-
-    # Mask sensitive keys for display
-    if config.get("openai_api_key"):
-        key = config["openai_api_key"]
-        if len(key) > 8:
-            config["openai_api_key"] = key[:4] + \
-                "•" * (len(key) - 8) + key[-4:]
-    if config.get("gemini_api_key"):
-        key = config["gemini_api_key"]
-        if len(key) > 8:
-            config["gemini_api_key"] = key[:4] + \
-                "•" * (len(key) - 8) + key[-4:]
-
-    return config
+    # Masked view is cached on the session whenever its config changes
+    return session_manager.get_masked_config(session_id) or MASKED_CONFIG
 
 
 @app.put("/api/v1/config")
@@ -729,8 +1399,7 @@ async def update_configuration(config: Configuration, response: Response, x_sess
         new_config = config.dict()
 
         # Load current global config and session config
-        global CURRENT_CONFIG
-        CURRENT_CONFIG = load_config()
+        global CURRENT_CONFIG, MASKED_CONFIG
         current_session_config = session_manager.get_session_config(
             session_id) or CURRENT_CONFIG.copy()
 
@@ -743,9 +1412,10 @@ async def update_configuration(config: Configuration, response: Response, x_sess
                 "gemini_api_key", CURRENT_CONFIG.get("gemini_api_key", ""))
 
         # Save to BOTH session AND global disk config
-        session_manager.set_session_config(session_id, new_config)
         save_config(new_config)  # Persist to disk
         CURRENT_CONFIG = new_config.copy()  # Update in-memory global config
+        MASKED_CONFIG = mask_config(CURRENT_CONFIG)
+        session_manager.set_session_config(session_id, new_config)
 
         return {"message": "Configuration saved successfully", "persisted": True}
     except Exception as e:
@@ -755,43 +1425,75 @@ async def update_configuration(config: Configuration, response: Response, x_sess
             status_code=500, detail=f"Failed to save: {str(e)}")
 
 
-@app.post("/api/v1/ingest")
-async def ingest_document(request: IngestRequest, response: Response, x_session_id: Optional[str] = Header(None)):
-    try:
-        session_id, session_db = session_manager.get_or_create_session(
-            x_session_id)
-        response.headers["X-Session-Id"] = session_id
-        session_config = session_manager.get_session_config(
-            session_id) or DEFAULT_CONFIG.copy()
+async def ingest_url(request: IngestRequest, session_id: str, session_db: VectorDatabase) -> Dict[str, Any]:
+    session_config = session_manager.get_session_config(
+        session_id) or DEFAULT_CONFIG.copy()
 
-        scraped_data = scrape_url(request.url)
-        chunk_size = session_config.get("chunk_size", 1000)
-        chunk_overlap = session_config.get("chunk_overlap", 200)
-        chunks = chunk_text(scraped_data["content"], chunk_size, chunk_overlap)
+    scraped_data = await scrape_url(request.url)
+    chunk_size = session_config.get("chunk_size", 1000)
+    chunk_overlap = session_config.get("chunk_overlap", 200)
+    chunks = chunk_text(scraped_data["content"], chunk_size, chunk_overlap)
 
-        if not chunks:
-            raise HTTPException(status_code=400, detail="No content extracted")
+    if not chunks:
+        raise HTTPException(status_code=400, detail="No content extracted")
 
-        provider = request.provider if request.provider else "opensource"
-        embeddings = get_embeddings(
-            chunks, provider, task_type="retrieval_document", config=session_config)
+    provider = request.provider if request.provider else "opensource"
+    embeddings = await get_embeddings(
+        chunks, provider, task_type="retrieval_document", config=session_config)
 
-        metadatas = [
-            {"source": request.url, "title": scraped_data["title"], "chunk_index": i, "total_chunks": len(
-                chunks), "session_id": session_id, "conversation_id": request.conversation_id or "default"}
-            for i in range(len(chunks))
-        ]
+    document_metadata = {"source": request.url, "title": scraped_data["title"],
+                         "session_id": session_id, "conversation_id": request.conversation_id or "default"}
 
-        session_db.add(embeddings=embeddings,
-                       documents=chunks, metadatas=metadatas)
+    async with session_db.write_lock:
+        # Graph inserts and tier rebuilds run in the threadpool; searches keep the old index meanwhile
+        prepared = await run_in_threadpool(
+            session_db.index_with, embeddings, provider in NORMALIZE_PROVIDERS)
+        session_db.add(embeddings=embeddings, documents=chunks,
+                       document_metadata=document_metadata, prepared=prepared)
 
-        return {
-            "message": "Document ingested successfully",
-            "title": scraped_data["title"],
-            "chunks_created": len(chunks),
-            "url": request.url,
-            "session_id": session_id
-        }
+    return {
+        "message": "Document ingested successfully",
+        "title": scraped_data["title"],
+        "chunks_created": len(chunks),
+        "url": request.url,
+        "session_id": session_id
+    }
+
+
+ingest_queue: asyncio.Queue = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+ingest_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+async def ingest_worker() -> None:
+    while True:
+        job_id, request, session_id = await ingest_queue.get()
+        job = ingest_jobs.get(job_id, {})
+        try:
+            session_db = session_manager.get_session(session_id)
+            if not session_db:
+                raise HTTPException(status_code=404, detail="Session expired")
+            job["status"] = "running"
+            job["result"] = await ingest_url(request, session_id, session_db)
+            job["status"] = "completed"
+        except HTTPException as he:
+            job["error"] = he.detail
+        except Exception as e:
+            job["error"] = f"Ingestion failed: {str(e)}"
+        finally:
+            # Also covers cancellation, so no job is left queued or running forever
+            if job.get("status") != "completed":
+                job["status"] = "failed"
+                job.setdefault("error", "Ingestion was interrupted")
+            ingest_queue.task_done()
+
+
+@app.post("/api/v1/ingest")
+async def ingest_document(request: IngestRequest, response: Response, x_session_id: Optional[str] = Header(None)):
+    try:
+        session_id, session_db = session_manager.get_or_create_session(
+            x_session_id)
+        response.headers["X-Session-Id"] = session_id
+        return await ingest_url(request, session_id, session_db)
     except HTTPException:
         raise
     except Exception as e:
@@ -799,6 +1501,31 @@ async def ingest_document(request: IngestRequest, response: Response, x_session_
             status_code=500, detail=f"Ingestion failed: {str(e)}")
 
 
+@app.post("/api/v1/ingest/jobs", status_code=202)
+async def queue_ingest(request: IngestRequest, response: Response, x_session_id: Optional[str] = Header(None)):
+    session_id, _ = session_manager.get_or_create_session(x_session_id)
+    response.headers["X-Session-Id"] = session_id
+    job_id = str(uuid4())
+    ingest_jobs[job_id] = {"status": "queued",
+                           "url": request.url, "session_id": session_id}
+    if len(ingest_jobs) > INGEST_JOBS_KEPT:
+        # Only finished jobs are forgotten; queued and running ones stay pollable
+        finished = [old_id for old_id, job in ingest_jobs.items()
+                    if job["status"] in ("completed", "failed")]
+        for old_id in finished[:len(ingest_jobs) - INGEST_JOBS_KEPT]:
+            del ingest_jobs[old_id]
+    await ingest_queue.put((job_id, request, session_id))
+    return {"job_id": job_id, "status": "queued", "session_id": session_id}
+
+
+@app.get("/api/v1/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id, **job}
+
+
 @app.post("/api/v1/ingest/manual")
 async def ingest_manual_content(request: dict, response: Response, x_session_id: Optional[str] = Header(None)):
     """Ingest manually pasted content without web scraping"""
@@ -830,17 +1557,17 @@ async def ingest_manual_content(request: dict, response: Response, x_session_id:
             raise HTTPException(
                 status_code=400, detail="No content chunks created")
 
-        embeddings = get_embeddings(
+        embeddings = await get_embeddings(
             chunks, provider, task_type="retrieval_document", config=session_config)
 
-        metadatas = [
-            {"source": "manual", "title": title, "chunk_index": i, "total_chunks": len(
-                chunks), "session_id": session_id, "conversation_id": conversation_id}
-            for i in range(len(chunks))
-        ]
+        document_metadata = {"source": "manual", "title": title,
+                             "session_id": session_id, "conversation_id": conversation_id}
 
-        session_db.add(embeddings=embeddings,
-                       documents=chunks, metadatas=metadatas)
+        async with session_db.write_lock:
+            prepared = await run_in_threadpool(
+                session_db.index_with, embeddings, provider in NORMALIZE_PROVIDERS)
+            session_db.add(embeddings=embeddings, documents=chunks,
+                           document_metadata=document_metadata, prepared=prepared)
 
         return {
             "message": "Manual content ingested successfully",
@@ -864,9 +1591,7 @@ async def get_knowledge_bases(x_session_id: Optional[str] = Header(None)):
         session_db = session_manager.get_session(x_session_id)
         if not session_db:
             return {"knowledge_bases": []}
-        sources = {metadata.get(
-            "title") for metadata in session_db.metadatas if metadata and metadata.get("title")}
-        return {"knowledge_bases": sorted([s for s in sources if s])}
+        return {"knowledge_bases": sorted(session_db.title_counts)}
     except:
         return {"knowledge_bases": []}
 
@@ -889,56 +1614,44 @@ async def query_documents(request: QueryRequest, x_session_id: Optional[str] = H
 
         logger.info(
             f"Getting embeddings for query with provider: {request.provider}")
-        query_embedding = get_embeddings(
-            [request.query], request.provider, task_type="retrieval_query", config=session_config)[0]
+        query_embedding = (await get_embeddings(
+            [request.query], request.provider, task_type="retrieval_query", config=session_config))[0]
 
         top_k = session_config.get("top_k_results", 5)
         logger.info(f"Searching with top_k={top_k}")
-        results = session_db.search(query_embedding, k=top_k)
+        # Conversation-specific OR global documents are filtered inside the search
+        results = session_db.search(
+            query_embedding, k=top_k, ef_search=session_config.get("ef_search", DEFAULT_CONFIG["ef_search"]), conversation_id=request.conversation_id,
+            normalize=request.provider in NORMALIZE_PROVIDERS, source=request.source_url)
         logger.info(
             f"Retrieved {len(results.get('documents', [[]])[0])} chunks from vector DB")
 
         if not results or not results.get("documents") or not results["documents"][0]:
+            if request.conversation_id and session_db.count():
+                return {"answer": "No documents found for this conversation. Please ingest documents first.", "sources": []}
             return {"answer": "I don't have enough information to answer. Please ingest relevant documentation first.", "sources": []}
 
         documents = results["documents"][0]
         metadatas_list = results.get("metadatas", [[]])[0]
 
-        # Smart filtering: conversation-specific OR global documents
-        if request.conversation_id:
-            filtered_docs = []
-            filtered_metas = []
-            for doc, meta in zip(documents, metadatas_list):
-                if meta:
-                    conv_id = meta.get("conversation_id")
-                    # Include if: matches conversation OR is global
-                    if conv_id == request.conversation_id or conv_id == "global":
-                        filtered_docs.append(doc)
-                        filtered_metas.append(meta)
-            if not filtered_docs:
-                return {"answer": "No documents found for this conversation. Please ingest documents first.", "sources": []}
-            documents = filtered_docs
-            metadatas_list = filtered_metas
-
         context = "\n\n".join(documents)
         logger.info(
             f"Querying LLM with provider: {request.provider}, context length: {len(context)}")
-        answer = query_llm(request.query, context,
-                           request.provider, config=session_config)
-
-        source_chunks = {}
-        for i, metadata in enumerate(metadatas_list):
-            if metadata and metadata.get("source"):
-                source_url = metadata.get("source")
-                chunk_index = metadata.get("chunk_index", i)
-                if source_url not in source_chunks:
-                    source_chunks[source_url] = []
-                source_chunks[source_url].append(
-                    {"index": chunk_index, "content": documents[i][:200] + "..." if len(documents[i]) > 200 else documents[i]})
+        answer, answered_by = await query_llm(request.query, context,
+                                              request.provider, config=session_config)
+
+        source_chunks: Dict[str, List[Dict[str, Any]]] = {}
+        for i, (document, metadata) in enumerate(zip(documents, metadatas_list)):
+            source_url = metadata.get("source") if metadata else None
+            if source_url:
+                snippet = document if len(
+                    document) <= 200 else document[:200] + "..."
+                source_chunks.setdefault(source_url, []).append(
+                    {"index": metadata.get("chunk_index", i), "content": snippet})
 
         sources = [{"url": url, "used_chunks": chunks}
                    for url, chunks in source_chunks.items()]
-        return {"answer": answer, "sources": sources, "chunks_used": len(documents), "session_id": x_session_id}
+        return {"answer": answer, "sources": sources, "chunks_used": len(documents), "provider": answered_by, "session_id": x_session_id}
     except HTTPException as he:
         logger.error(f"HTTPException in query: {he.detail}")
         raise
@@ -956,9 +1669,7 @@ async def get_database_stats(x_session_id: Optional[str] = Header(None)):
         session_db = session_manager.get_session(x_session_id)
         if not session_db:
             return {"total_documents": 0, "total_chunks": 0, "collections": [], "message": "Session expired"}
-        unique_sources = {metadata.get(
-            "source") for metadata in session_db.metadatas if metadata and metadata.get("source")}
-        return {"total_documents": len(unique_sources), "total_chunks": session_db.count(), "collections": ["knowledge_base"], "session_id": x_session_id}
+        return {"total_documents": len(session_db.source_rows), "total_chunks": session_db.count(), "collections": ["knowledge_base"], "session_id": x_session_id}
     except:
         return {"total_documents": 0, "total_chunks": 0, "collections": []}
 
@@ -971,18 +1682,24 @@ async def list_sources(x_session_id: Optional[str] = Header(None)):
         session_db = session_manager.get_session(x_session_id)
         if not session_db:
             return {"sources": [], "message": "Session expired"}
-        source_counts = {}
-        for metadata in session_db.metadatas:
-            if metadata and metadata.get("source"):
-                source = metadata["source"]
-                source_counts[source] = source_counts.get(source, 0) + 1
-        sources = [{"url": source, "chunks": count}
-                   for source, count in source_counts.items()]
+        sources = [{"url": source, "chunks": len(rows)}
+                   for source, rows in session_db.source_rows.items()]
         return {"sources": sources, "session_id": x_session_id}
     except:
         return {"sources": []}
 
 
+CHUNKS_JSON_BATCH = 256
+
+
+def iter_chunks_json(url: str, chunks: List[Dict[str, Any]], session_id: str):
+    yield b'{"url":' + orjson.dumps(url) + b',"total_chunks":' + str(len(chunks)).encode() + b',"chunks":['
+    for start in range(0, len(chunks), CHUNKS_JSON_BATCH):
+        batch = orjson.dumps(chunks[start:start + CHUNKS_JSON_BATCH])[1:-1]
+        yield batch if start == 0 else b"," + batch
+    yield b'],"session_id":' + orjson.dumps(session_id) + b'}'
+
+
 @app.get("/api/v1/database/source/chunks")
 async def get_source_chunks(url: str, x_session_id: Optional[str] = Header(None)):
     try:
@@ -994,12 +1711,13 @@ async def get_source_chunks(url: str, x_session_id: Optional[str] = Header(None)
         session_db = session_manager.get_session(x_session_id)
         if not session_db:
             raise HTTPException(status_code=404, detail="Session expired")
-        chunks = [{"content": session_db.documents[i], "metadata": metadata, "index": i}
-                  for i, metadata in enumerate(session_db.metadatas) if metadata and metadata.get("source") == url]
+        chunks = [{"content": session_db.documents[i], "metadata": session_db.metadata(i), "index": i}
+                  for i in session_db.source_rows.get(url, [])]
         if not chunks:
             raise HTTPException(
                 status_code=404, detail=f"Source not found: {url}")
-        return {"url": url, "total_chunks": len(chunks), "chunks": chunks, "session_id": x_session_id}
+        # Serialized in batches from the threadpool rather than as one dump on the event loop
+        return StreamingResponse(iter_chunks_json(url, chunks, x_session_id), media_type="application/json")
     except HTTPException:
         raise
     except Exception as e:
@@ -1019,22 +1737,14 @@ async def delete_source(url: str, x_session_id: Optional[str] = Header(None)):
         if not session_db:
             raise HTTPException(status_code=404, detail="Session expired")
 
-        indices_to_keep = []
-        deleted_count = 0
-        for i, metadata in enumerate(session_db.metadatas):
-            if metadata and metadata.get("source") == url:
-                deleted_count += 1
-            else:
-                indices_to_keep.append(i)
-
-        if deleted_count == 0:
-            raise HTTPException(
-                status_code=404, detail=f"Source not found: {url}")
-
-        new_documents = [session_db.documents[i] for i in indices_to_keep]
-        new_metadatas = [session_db.metadatas[i] for i in indices_to_keep]
-
-        if indices_to_keep:
+        async with session_db.write_lock:
+            rows = session_db.source_rows.get(url)
+            if not rows:
+                raise HTTPException(
+                    status_code=404, detail=f"Source not found: {url}")
+            deleted_count = len(rows)
+            delete_mask = np.zeros(len(session_db.documents), dtype=bool)
+            delete_mask[rows] = True
             if not faiss:
                 raise HTTPException(
                     status_code=500, detail="FAISS not available")
@@ -1042,30 +1752,13 @@ async def delete_source(url: str, x_session_id: Optional[str] = Header(None)):
                 raise HTTPException(
                     status_code=500, detail="Index not initialized")
 
-            kept_embeddings = []
-            for i in indices_to_keep:
-                vec = np.zeros(session_db.index.d,
-                               dtype=np.float32)  # type: ignore
-                session_db.index.reconstruct(i, vec)  # type: ignore
-                kept_embeddings.append(vec)
-
-            embeddings_array = np.array(kept_embeddings, dtype=np.float32)
-            actual_dimension = embeddings_array.shape[1]
-            session_db.index = faiss.IndexFlatL2(
-                actual_dimension)  # type: ignore
-            session_db.dimension = actual_dimension
-            session_db.index.add(embeddings_array)  # type: ignore
-        else:
-            if not faiss:
-                raise HTTPException(
-                    status_code=500, detail="FAISS not available")
-            session_db.index = faiss.IndexFlatL2(
-                session_db.dimension)  # type: ignore
-
-        session_db.documents = new_documents
-        session_db.metadatas = new_metadatas
+            if session_db.can_tombstone(delete_mask):
+                session_db.tombstone_rows(delete_mask)
+            else:
+                new_index = await run_in_threadpool(session_db.index_without, delete_mask)
+                session_db.remove_rows(delete_mask, new_index)
 
-        return {"message": f"Deleted {deleted_count} chunks", "deleted_chunks": deleted_count, "remaining_chunks": len(new_documents), "source": url, "session_id": x_session_id}
+        return {"message": f"Deleted {deleted_count} chunks", "deleted_chunks": deleted_count, "remaining_chunks": len(session_db.documents), "source": url, "session_id": x_session_id}
     except HTTPException:
         raise
     except Exception as e:
@@ -1081,7 +1774,9 @@ async def clear_database(x_session_id: Optional[str] = Header(None)):
         session_db = session_manager.get_session(x_session_id)
         if not session_db:
             raise HTTPException(status_code=404, detail="Session expired")
-        session_db.clear()
+        async with session_db.write_lock:
+            # O(1) reset; kept on the loop so searches never see a half-swapped index and row_map
+            session_db.clear()
         return {"message": "Session database cleared", "session_id": x_session_id}
     except HTTPException:
         raise
@@ -1124,4 +1819,11 @@ if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
     host = os.getenv("HOST", "0.0.0.0")
-    uvicorn.run(app, host=host, port=port)
+    # Sessions live in process memory; more than one worker needs sticky routing
+    workers = int(os.getenv("WORKERS", "1"))
+    if workers > 1:
+        # Worker processes need an import string; each one imports main itself
+        uvicorn.run("main:app", host=host, port=port, workers=workers)
+    else:
+        # Passing the object avoids importing this module a second time as "main"
+        uvicorn.run(app, host=host, port=port)
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 def configure(api_key: str) -> None: ...
 
@@ -8,6 +8,6 @@ class GenerativeModel:
 
 def embed_content(
     model: str,
-    content: str,
+    content: Union[str, List[str]],
     task_type: str = "retrieval_document"
-) -> Dict[str, List[float]]: ...
+) -> Dict[str, Any]: ...
@@ -13,6 +13,10 @@ fi
 
 echo "Using Python: $($PYTHON_CMD --version)"
 
+# Probed once; reused for install and start
+HAS_BUN=false
+command -v bun &> /dev/null && HAS_BUN=true
+
 # Virtual environment
 if [ ! -d "venv" ]; then
     echo "Creating virtual environment..."
@@ -30,50 +34,81 @@ fi
 echo "Installing UV..."
 pip install -q --upgrade uv
 
+# Backend and frontend installs are independent; run them side by side
 echo "Installing backend dependencies..."
-cd backend && uv pip install -q -r requirements.txt && cd ..
+(cd backend && uv pip install -q -r requirements.txt) &
+BACKEND_INSTALL_PID=$!
+# Don't leave the backend install running if the frontend install fails or the script is interrupted
+trap 'pkill -P $BACKEND_INSTALL_PID 2>/dev/null || true; kill $BACKEND_INSTALL_PID 2>/dev/null || true' EXIT
 
 echo "Installing frontend dependencies..."
-if command -v bun &> /dev/null; then
+if $HAS_BUN; then
     bun install
 else
     npm install
 fi
+wait $BACKEND_INSTALL_PID
+trap - EXIT
 
 # Clear ports
+port_in_use() {
+    (exec 3<>"/dev/tcp/127.0.0.1/$1") 2>/dev/null || (exec 3<>"/dev/tcp/::1/$1") 2>/dev/null
+}
+
+clear_ports() {
+    # lsof only runs when a connect probe finds something listening, once for all busy ports
+    local args=()
+    for port in "$@"; do
+        if port_in_use "$port"; then
+            args+=(-i:"$port")
+        fi
+    done
+    if [ ${#args[@]} -gt 0 ]; then
+        lsof -t "${args[@]}" 2>/dev/null | xargs kill -9 2>/dev/null || true
+    fi
+}
+
 echo "Clearing ports..."
-lsof -ti:8000 2>/dev/null | xargs kill -9 2>/dev/null || true
-lsof -ti:8080 2>/dev/null | xargs kill -9 2>/dev/null || true
+clear_ports 8000 8080
 
 # Start services
 echo "Starting backend..."
 (cd backend && uvicorn main:app --reload --host 0.0.0.0 --port 8000 --log-level warning) &
 BACKEND_PID=$!
 
-# Wait for backend to be ready (up to 30 seconds)
-echo -n "Waiting for backend to be ready"
-for i in {1..30}; do
-    if curl -s http://localhost:8000/api/v1/health > /dev/null 2>&1; then
-        echo " ✓"
-        echo "Backend is ready!"
-        break
-    fi
-    echo -n "."
-    if [ $i -eq 30 ]; then
-        echo " ✗"
-        echo "Warning: Backend didn't respond after 30 seconds"
-    fi
-    sleep 1
-done
+# Re-run a readiness probe every 0.2s (up to 30 seconds) instead of sleeping in whole seconds
+wait_until_ready() {
+    local name=$1
+    shift
+    echo -n "Waiting for $name to be ready"
+    for i in {1..150}; do
+        if "$@" > /dev/null 2>&1; then
+            echo " ✓"
+            echo "$name is ready!"
+            return
+        fi
+        if [ $((i % 5)) -eq 0 ]; then
+            echo -n "."
+        fi
+        sleep 0.2
+    done
+    echo " ✗"
+    echo "Warning: $name didn't respond after 30 seconds"
+}
+
+# --reload binds the port before the app loads, so ask the health endpoint
+wait_until_ready "Backend" curl -s http://localhost:8000/api/v1/health
 
 echo "Starting frontend..."
-if command -v bun &> /dev/null; then
+if $HAS_BUN; then
     bun run dev &
 else
     npm run dev &
 fi
 FRONTEND_PID=$!
 
+wait_until_ready "Frontend" port_in_use 8080
+
 echo ""
 echo "=== Services Running ==="
 echo "Frontend: http://localhost:8080"
@@ -94,4 +129,10 @@ cleanup() {
 
 trap cleanup SIGINT SIGTERM
 
-wait
+# Block until either service exits, then take the other one down too (wait -n needs bash 4.3+)
+if ((BASH_VERSINFO[0] > 4 || (BASH_VERSINFO[0] == 4 && BASH_VERSINFO[1] >= 3))); then
+    wait -n || true
+else
+    wait || true
+fi
+cleanup